@@ -1,5 +1,9 @@
+import hmac
+import threading
+import time
 from datetime import datetime, timedelta
 from typing import Optional
+from cachetools import TLRUCache, TTLCache
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
@@ -10,15 +14,60 @@ from models import Admin
 from config import settings
 
 # Password hashing context
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__rounds=settings.password_hash_rounds
+)
+
+# Hash verified against when a login names an unknown user (timing equalization)
+DUMMY_HASH = pwd_context.hash("dummy-password-for-timing")
 
 # HTTP Bearer token scheme
 security = HTTPBearer()
 
+# Short-lived cache of successful password verifications.
+# Keys are HMAC digests of password + hash, so no plaintext is kept in memory;
+# failures are never cached, so guessing traffic can't evict real entries.
+_verify_cache = TTLCache(maxsize=1024, ttl=60)
+_verify_cache_lock = threading.Lock()
+
+# Token -> (admin, exp) for recently seen bearer tokens, so protected
+# endpoints skip the Admin SELECT. Entries never outlive the token itself.
+ADMIN_CACHE_TTL = 60
+_admin_cache_lock = threading.Lock()
+
+
+def _admin_cache_ttu(token: str, entry: tuple, now: float) -> float:
+    """Expire a cached admin after ADMIN_CACHE_TTL or at token expiry, whichever is first"""
+    remaining = entry[1] - time.time()
+    return now + max(0.0, min(ADMIN_CACHE_TTL, remaining))
+
+
+_admin_cache = TLRUCache(maxsize=1024, ttu=_admin_cache_ttu)
+
+
+def _verify_cache_key(plain_password: str, hashed_password: str) -> bytes:
+    """Build the cache key for a password/hash pair"""
+    return hmac.new(
+        settings.secret_key.encode(),
+        plain_password.encode() + hashed_password.encode(),
+        "sha256"
+    ).digest()
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    """Verify a password against its hash (successes cached briefly)"""
+    key = _verify_cache_key(plain_password, hashed_password)
+    with _verify_cache_lock:
+        if key in _verify_cache:
+            return True
+    
+    result = pwd_context.verify(plain_password, hashed_password)
+    if result:
+        with _verify_cache_lock:
+            _verify_cache[key] = True
+    return result
 
 
 def get_password_hash(password: str) -> str:
@@ -39,18 +88,43 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-def decode_access_token(token: str) -> Optional[str]:
-    """Decode and verify a JWT access token"""
+# Tokens minted by login, reused for repeated logins in the same 15s window
+TOKEN_CACHE_WINDOW = 15
+_token_cache = TTLCache(maxsize=256, ttl=TOKEN_CACHE_WINDOW)
+_token_cache_lock = threading.Lock()
+
+
+def get_login_token(username: str) -> str:
+    """Access token for a verified login, reusing one minted earlier in the current window"""
+    key = (username, int(time.time() // TOKEN_CACHE_WINDOW))
+    with _token_cache_lock:
+        token = _token_cache.get(key)
+    if token is None:
+        token = create_access_token(data={"sub": username})
+        with _token_cache_lock:
+            _token_cache[key] = token
+    return token
+
+
+def _decode_token_payload(token: str) -> Optional[dict]:
+    """Decode and verify a JWT, returning its claims"""
     try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        username: str = payload.get("sub")
-        if username is None:
-            return None
-        return username
+        return jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
     except JWTError:
         return None
 
 
+def decode_access_token(token: str) -> Optional[str]:
+    """Decode and verify a JWT access token"""
+    payload = _decode_token_payload(token)
+    if payload is None:
+        return None
+    username: str = payload.get("sub")
+    if username is None:
+        return None
+    return username
+
+
 def get_current_admin(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
@@ -63,12 +137,26 @@ def get_current_admin(
     )
     
     token = credentials.credentials
-    username = decode_access_token(token)
+    with _admin_cache_lock:
+        cached = _admin_cache.get(token)
+    if cached is not None:
+        if cached[0] is None:
+            raise credentials_exception
+        return cached[0]
     
-    if username is None:
+    payload = _decode_token_payload(token)
+    if payload is None or payload.get("sub") is None:
         raise credentials_exception
     
-    admin = db.query(Admin).filter(Admin.username == username).first()
+    admin = db.query(Admin).filter(Admin.username == payload["sub"]).first()
+    if admin is not None:
+        # Detach so the cached instance can be shared across request sessions
+        db.expunge(admin)
+    
+    # Unknown users are cached too, so a replayed token doesn't re-query
+    with _admin_cache_lock:
+        _admin_cache[token] = (admin, payload.get("exp", 0))
+    
     if admin is None:
         raise credentials_exception
     
@@ -1,6 +1,7 @@
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Minimum cost factor: this is only a smoke test of the bcrypt backend
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=4)
 
 hash = pwd_context.hash("admin123")
 print(f"Hash: {hash}")
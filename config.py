@@ -1,3 +1,4 @@
+from functools import lru_cache
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import field_validator
 from typing import Optional
@@ -8,12 +9,20 @@ class Settings(BaseSettings):
     
     # Database
     database_url: str = "sqlite:///./face_detection.db"
+    db_pool_size: int = 20
+    db_max_overflow: int = 10
+    db_pool_timeout: int = 30  # seconds to wait for a free connection
+    db_pool_recycle: int = 3600  # seconds before a pooled connection is replaced
+    db_use_null_pool: bool = False  # True when running behind PgBouncer (transaction pooling)
     
     # JWT Authentication
     secret_key: str = "your-secret-key-change-this-in-production"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 1440  # 24 hours
     
+    # Password hashing (pbkdf2_sha256 iterations; lower only for local dev)
+    password_hash_rounds: int = 29000
+    
     # MQTT Configuration
     mqtt_broker: str = "ed725a79580548b5a05651ec325d471d.s1.eu.hivemq.cloud"
     mqtt_port: int = 8883
@@ -21,11 +30,16 @@ class Settings(BaseSettings):
     mqtt_password: Optional[str] = "Voxov123"
     mqtt_topic_prefix: str = "factory/machine"
     mqtt_use_tls: bool = True
+    mqtt_message_expiry: int = 60  # seconds an unlock/lock signal stays deliverable
     
     # File upload settings
     upload_dir: str = "./uploads"
     max_upload_size: int = 10 * 1024 * 1024  # 10MB
     
+    # Sync settings
+    sync_max_body_size: int = 50 * 1024 * 1024  # 50MB; larger /api/sync uploads get 413
+    sync_batch_size: int = 1000  # login logs inserted and committed per batch
+    
     # Default admin credentials (for initial setup)
     default_admin_username: str = "admin"
     default_admin_password: str = "admin123"
@@ -44,5 +58,13 @@ class Settings(BaseSettings):
         return v
 
 
-# Global settings instance
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Return the process-wide settings, reading the environment/.env only once"""
+    return Settings()
+
+
+# Global settings instance. Modules bind this object at import time, so
+# get_settings.cache_clear() does not change what they see; the cache only
+# ensures the environment/.env is parsed once.
+settings = get_settings()
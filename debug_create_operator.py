@@ -1,14 +1,17 @@
-import requests
+import httpx
 import sys
 
 BASE_URL = "http://localhost:8000/api"
 
+# Shared client so every call reuses the same keep-alive connection
+client = httpx.Client(base_url=BASE_URL, timeout=10.0)
+
 def test_create_operator():
     # 1. Login
     print("🔑 Logging in as admin...")
     login_payload = {"username": "admin", "password": "admin123"}
     try:
-        login_res = requests.post(f"{BASE_URL}/admin/login", json=login_payload)
+        login_res = client.post("/admin/login", json=login_payload)
         if login_res.status_code != 200:
             print(f"❌ Login failed: {login_res.status_code} - {login_res.text}")
             return
@@ -32,8 +35,8 @@ def test_create_operator():
             'shift': 'Day'
         }
         
-        res = requests.post(
-            f"{BASE_URL}/operators", 
+        res = client.post(
+            "/operators",
             headers=headers,
             data=data,
             files=files
@@ -47,7 +50,7 @@ def test_create_operator():
             
             # Cleanup
             print("🧹 Deleting test operator...")
-            del_res = requests.delete(f"{BASE_URL}/operators/TEST001", headers=headers)
+            del_res = client.delete("/operators/TEST001", headers=headers)
             print(f"Delete Status: {del_res.status_code}")
             
         elif res.status_code == 403:
@@ -1,16 +1,21 @@
-import requests
+import asyncio
+import httpx
 import sys
 
+BASE_URL = "http://localhost:8000/api"
+LOGIN_PAYLOAD = {
+    "username": "admin",
+    "password": "admin123"
+}
+
+# Shared client so repeated calls reuse the same keep-alive connection
+client = httpx.Client(base_url=BASE_URL, timeout=10.0)
+
+
 def test_login():
-    url = "http://localhost:8000/api/admin/login"
-    payload = {
-        "username": "admin",
-        "password": "admin123"
-    }
-    
-    print(f"Attempting login to {url}...")
+    print(f"Attempting login to {BASE_URL}/admin/login...")
     try:
-        response = requests.post(url, json=payload)
+        response = client.post("/admin/login", json=LOGIN_PAYLOAD)
         print(f"Status Code: {response.status_code}")
         print(f"Response: {response.text}")
         
@@ -24,5 +29,23 @@ def test_login():
     except Exception as e:
         print(f"❌ Connection failed: {e}")
 
+
+async def stress_login(count: int):
+    """Fire `count` concurrent logins over a pooled async client"""
+    print(f"Firing {count} concurrent logins...")
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=30.0) as async_client:
+        responses = await asyncio.gather(
+            *(async_client.post("/admin/login", json=LOGIN_PAYLOAD) for _ in range(count)),
+            return_exceptions=True
+        )
+    
+    ok = sum(1 for r in responses if isinstance(r, httpx.Response) and r.status_code == 200)
+    print(f"✅ {ok}/{count} logins succeeded")
+
+
 if __name__ == "__main__":
-    test_login()
+    # Usage: python debug_login.py [concurrent_logins]
+    if len(sys.argv) > 1:
+        asyncio.run(stress_login(int(sys.argv[1])))
+    else:
+        test_login()
@@ -3,31 +3,62 @@ Database initialization script
 Creates tables and default admin user on first run
 """
 import sys
+from sqlalchemy import inspect, select
 from sqlalchemy.orm import Session
 from database import engine, Base, SessionLocal
 from models import Admin
 from auth import get_password_hash
 from config import settings
 
+# Built once at import; SQLAlchemy caches its compiled form
+_ADMIN_EXISTS = select(Admin.id).limit(1)
+
 
 def init_database():
     """Initialize database tables"""
     print("🔧 Initializing database...")
-    Base.metadata.create_all(bind=engine)
-    print("✅ Database tables created")
+    
+    # One reflection query instead of a per-table existence check
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    missing_tables = [
+        table for name, table in Base.metadata.tables.items()
+        if name not in existing_tables
+    ]
+    
+    # Tables created before an index was added to the models won't get it
+    # from create_all, so add any that are missing
+    missing_indexes = []
+    for name, table in Base.metadata.tables.items():
+        if name in existing_tables:
+            existing_indexes = {ix["name"] for ix in inspector.get_indexes(name)}
+            missing_indexes.extend(ix for ix in table.indexes if ix.name not in existing_indexes)
+    
+    if not missing_tables and not missing_indexes:
+        print("✅ Database tables already exist")
+        return
+    
+    # Run all DDL in a single transaction
+    with engine.begin() as connection:
+        if missing_tables:
+            Base.metadata.create_all(bind=connection, tables=missing_tables, checkfirst=False)
+            print("✅ Database tables created")
+        for index in missing_indexes:
+            index.create(bind=connection)
+            print(f"✅ Index created: {index.name}")
 
 
 def create_default_admin(db: Session):
     """Create default admin user if none exists"""
-    # Check if any admin exists
-    admin_count = db.query(Admin).count()
+    # Check if any admin exists (LIMIT 1 instead of a full COUNT)
+    existing_admin = db.execute(_ADMIN_EXISTS).scalar()
     
-    if admin_count == 0:
+    if existing_admin is None:
         print("👤 No admin found. Creating default admin...")
         
-        # Get credentials from environment or use defaults
-        default_username = getattr(settings, 'default_admin_username', 'admin')
-        default_password = getattr(settings, 'default_admin_password', 'admin123')
+        # Get credentials from settings (environment or defaults)
+        default_username = settings.default_admin_username
+        default_password = settings.default_admin_password
         
         # Create admin
         hashed_password = get_password_hash(default_password)
@@ -47,7 +78,7 @@ def create_default_admin(db: Session):
         
         return admin
     else:
-        print(f"✅ Found {admin_count} admin(s) in database")
+        print("✅ Admin account found in database")
         return None
 
 
@@ -1,11 +1,46 @@
 """
 Logging configuration for the application
 """
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
+import threading
 from pathlib import Path
 
 
+# Seconds a buffered (sub-ERROR) record may wait before it is written to disk
+FLUSH_INTERVAL = 2.0
+
+# Background listeners draining the file-log queues (stopped at exit)
+_listeners = []
+
+# Buffered file handlers, flushed every FLUSH_INTERVAL by _flush_thread
+_buffered_handlers = []
+_stop_flushing = threading.Event()
+_flush_thread = None
+
+
+def _flush_periodically():
+    """Write out buffered records so INFO lines never sit in memory for long"""
+    while not _stop_flushing.wait(FLUSH_INTERVAL):
+        for handler in list(_buffered_handlers):
+            handler.flush()
+
+
+def _stop_listeners():
+    """Flush pending file log records on interpreter exit"""
+    _stop_flushing.set()
+    for listener in _listeners:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+atexit.register(_stop_listeners)
+
+
 def setup_logger(name: str, log_file: str = None, level=logging.INFO):
     """
     Set up logger with console and optionally file handler
@@ -43,6 +78,8 @@ def setup_logger(name: str, log_file: str = None, level=logging.INFO):
     logger.addHandler(console_handler)
     
     # File handler (if log_file specified)
+    # Records are queued and written by a background thread in batches
+    # (at most FLUSH_INTERVAL seconds late; ERROR and above immediately).
     if log_file:
         log_path = Path(log_file)
         log_path.parent.mkdir(parents=True, exist_ok=True)
@@ -50,7 +87,25 @@ def setup_logger(name: str, log_file: str = None, level=logging.INFO):
         file_handler = logging.FileHandler(log_file)
         file_handler.setLevel(level)
         file_handler.setFormatter(detailed_formatter)
-        logger.addHandler(file_handler)
+        
+        buffered_handler = logging.handlers.MemoryHandler(
+            capacity=512,
+            flushLevel=logging.ERROR,
+            target=file_handler
+        )
+        
+        log_queue = queue.Queue(-1)
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        
+        listener = logging.handlers.QueueListener(log_queue, buffered_handler)
+        listener.start()
+        _listeners.append(listener)
+        _buffered_handlers.append(buffered_handler)
+        
+        global _flush_thread
+        if _flush_thread is None:
+            _flush_thread = threading.Thread(target=_flush_periodically, name="log-flush", daemon=True)
+            _flush_thread.start()
     
     return logger
 
@@ -105,13 +105,17 @@
 #         "status": "healthy",
 #         "mqtt_connected": mqtt_client.connected
 #     }
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from contextlib import asynccontextmanager
 from datetime import datetime
+import io
 import os
+import threading
+import traceback
 
 # Import database and models
 from database import engine, Base
@@ -160,7 +164,8 @@ app = FastAPI(
     title="Face Detection IoT API",
     description="Backend API for Face Recognition Access Control System with MQTT Integration",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 
@@ -179,17 +184,75 @@ app.add_middleware(
 )
 
 
+# Compress larger responses (e.g. /api/sync/all JSON with base64 images)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+
+class SyncBodyLimitMiddleware:
+    """
+    Cap the body size of POST /api/sync/* uploads
+    Plain ASGI (no per-request task group); other routes pass straight through
+    """
+    
+    def __init__(self, app, max_body_size: int):
+        self.app = app
+        self.max_body_size = max_body_size
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith("/api/sync"):
+            await self.app(scope, receive, send)
+            return
+        
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        too_large = f"Sync payload exceeds {self.max_body_size} bytes; send it in smaller batches"
+        
+        if content_length is not None:
+            if not content_length.isdigit() or int(content_length) > self.max_body_size:
+                await JSONResponse(status_code=413, content={"detail": too_large})(scope, receive, send)
+                return
+        elif b"chunked" not in headers.get(b"transfer-encoding", b"").lower():
+            await JSONResponse(status_code=411, content={"detail": "Content-Length required"})(scope, receive, send)
+            return
+        
+        # Count bytes as they arrive, so chunked uploads (no Content-Length)
+        # are cut off too; FastAPI re-raises HTTPException from body parsing
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    raise HTTPException(status_code=413, detail=too_large)
+            return message
+        
+        await self.app(scope, limited_receive, send)
+
+
+app.add_middleware(SyncBodyLimitMiddleware, max_body_size=settings.sync_max_body_size)
+
+
+# Serializes writers to backend_crash.log
+_crash_log_lock = threading.Lock()
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
-    import traceback
     print(f"🔥 Unhandled Exception: {exc}")
     traceback.print_exc()
     
-    with open("backend_crash.log", "a") as f:
-        f.write(f"Timestamp: {datetime.now()}\n")
-        f.write(f"Exception: {exc}\n")
-        traceback.print_exc(file=f)
-        f.write("-" * 50 + "\n")
+    # Build the whole entry in memory, then append it with a single write
+    buffer = io.StringIO()
+    buffer.write(f"Timestamp: {datetime.now()}\n")
+    buffer.write(f"Exception: {exc}\n")
+    traceback.print_exc(file=buffer)
+    buffer.write("-" * 50 + "\n")
+    
+    with _crash_log_lock:
+        with open("backend_crash.log", "a") as f:
+            f.write(buffer.getvalue())
         
     return JSONResponse(
         status_code=500,
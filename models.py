@@ -40,7 +40,7 @@
 #     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.sql import func
 from database import Base
 
@@ -73,6 +73,12 @@ class Operator(Base):
     # Deletion tracking (soft delete)
     deleted = Column(Boolean, default=False)  # Soft delete flag
     deleted_at = Column(DateTime(timezone=True), nullable=True)  # When deleted
+    
+    __table_args__ = (
+        # Sync pulls filter on these timestamps
+        Index("ix_operator_created_at", "created_at"),
+        Index("ix_operator_cloud_updated_at", "cloud_updated_at"),
+    )
 
 
 class LoginLog(Base):
@@ -92,3 +98,19 @@ class LoginLog(Base):
     # Deletion tracking (soft delete)
     deleted = Column(Boolean, default=False)  # Soft delete flag
     deleted_at = Column(DateTime(timezone=True), nullable=True)  # When deleted
+    
+    __table_args__ = (
+        # Duplicate check when receiving synced logs
+        Index("ix_loginlog_op_login", "operator_id", "login_time"),
+        # Sync pulls filter on these timestamps
+        Index("ix_loginlog_created_at", "created_at"),
+        Index("ix_loginlog_deleted_at", "deleted_at"),
+        # Operator logout looks up the most recent open session
+        Index(
+            "ix_loginlog_open",
+            "operator_id",
+            login_time.desc(),
+            postgresql_where=logout_time.is_(None),
+            sqlite_where=logout_time.is_(None),
+        ),
+    )
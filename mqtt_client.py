@@ -2,11 +2,20 @@
 Enhanced MQTT Client with proper error handling and logging
 """
 import paho.mqtt.client as mqtt
-import json
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+from paho.mqtt.reasoncodes import ReasonCodes
+import certifi
+import orjson
+import ssl
+import threading
 import time
-from datetime import datetime
+from collections import deque
+from datetime import datetime, timezone
 from typing import Optional
+from pydantic import ValidationError
 from config import settings
+from schemas import MQTT_MESSAGE_ADAPTER
 import logging
 
 # Create logger for MQTT
@@ -21,46 +30,98 @@ console_handler.setFormatter(formatter)
 logger.addHandler(console_handler)
 
 
+def _timestamp() -> str:
+    """UTC ISO-8601 timestamp (second precision) for MQTT payloads"""
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
 class MQTTClient:
     """MQTT Client wrapper with HiveMQ Cloud support"""
     
     def __init__(self):
-        self.client: Optional[mqtt.Client] = None
         self.connected = False
-        self.connection_attempts = 0
-        self.max_reconnect_attempts = 5
-        self.reconnect_delay = 5  # seconds
+        self._connected_event = threading.Event()  # Set once CONNACK is received
+        self.reconnect_min_delay = 1  # seconds
+        self.reconnect_max_delay = 30  # seconds
+        # Messages published while disconnected, replayed on (re)connect
+        # as (topic, payload, queued_at) tuples
+        self._pending = deque(maxlen=1024)
+        # Guards "check connected + enqueue" against "set connected + flush", so a
+        # message can't be queued just after the reconnect flush and sit there
+        self._pending_lock = threading.Lock()
+        # MQTT v5 publish properties: brokers drop signals nobody received in time
+        self._publish_properties = Properties(PacketTypes.PUBLISH)
+        self._publish_properties.MessageExpiryInterval = settings.mqtt_message_expiry
+        # Built once and reused by every (re)connect
+        self._tls_context: Optional[ssl.SSLContext] = (
+            ssl.create_default_context(cafile=certifi.where()) if settings.mqtt_use_tls else None
+        )
+        
+        # Create the paho client once; connect() and reconnects reuse it
+        self.client = self._create_client()
         
         logger.info(f"MQTT client initialized for broker: {settings.mqtt_broker}:{settings.mqtt_port}")
     
-    def _on_connect(self, client, userdata, flags, rc):
+    def _create_client(self) -> mqtt.Client:
+        """Build and configure the underlying paho client"""
+        # Create client
+        client = mqtt.Client(
+            client_id=f"FastAPI_Backend_{int(time.time())}",
+            protocol=mqtt.MQTTv5
+        )
+        
+        # Set callbacks
+        client.on_connect = self._on_connect
+        client.on_disconnect = self._on_disconnect
+        client.on_publish = self._on_publish
+        client.on_message = self._on_message
+        
+        # Set username and password if provided
+        if settings.mqtt_username and settings.mqtt_password:
+            logger.debug("Setting MQTT credentials...")
+            client.username_pw_set(
+                settings.mqtt_username,
+                settings.mqtt_password
+            )
+        
+        # Configure TLS/SSL if needed
+        if self._tls_context:
+            logger.debug("Configuring TLS/SSL...")
+            client.tls_set_context(self._tls_context)
+        
+        # Let paho's network loop handle reconnects with backoff
+        client.reconnect_delay_set(
+            min_delay=self.reconnect_min_delay,
+            max_delay=self.reconnect_max_delay
+        )
+        
+        return client
+    
+    def _on_connect(self, client, userdata, flags, rc, properties=None):
         """Callback when connected to MQTT broker"""
         if rc == 0:
-            self.connected = True
-            self.connection_attempts = 0
             logger.info("✅ Successfully connected to MQTT broker")
             logger.info(f"Connection flags: {flags}")
+            with self._pending_lock:
+                self.connected = True
+                self._connected_event.set()
+                self._flush_pending()
         else:
             self.connected = False
-            error_messages = {
-                1: "Connection refused - incorrect protocol version",
-                2: "Connection refused - invalid client identifier",
-                3: "Connection refused - server unavailable",
-                4: "Connection refused - bad username or password",
-                5: "Connection refused - not authorized",
-            }
-            error_msg = error_messages.get(rc, f"Unknown error code: {rc}")
-            logger.error(f"❌ Failed to connect to MQTT broker. {error_msg}")
+            # MQTT v5 reason codes carry their own description
+            logger.error(f"❌ Failed to connect to MQTT broker. Connection refused - {rc}")
             
             # Provide actionable debugging hints
-            if rc == 4:
+            if rc == 134:  # Bad user name or password
                 logger.error("⚠️  Check your MQTT_USERNAME and MQTT_PASSWORD in .env file")
-            elif rc == 5:
+            elif rc == 135:  # Not authorized
                 logger.error("⚠️  Check if your HiveMQ Cloud credentials have proper permissions")
     
-    def _on_disconnect(self, client, userdata, rc):
+    def _on_disconnect(self, client, userdata, rc, properties=None):
         """Callback when disconnected from MQTT broker"""
-        self.connected = False
+        with self._pending_lock:
+            self.connected = False
+            self._connected_event.clear()
         
         if rc == 0:
             logger.info("Disconnected from MQTT broker (intentional)")
@@ -74,12 +135,16 @@ class MQTTClient:
                 6: "Unused",
                 7: "Connection lost / Network error",
             }
-            reason = disconnect_reasons.get(rc, f"Unknown reason code: {rc}")
+            if isinstance(rc, ReasonCodes):
+                # Sent by the broker in an MQTT v5 DISCONNECT packet
+                reason = str(rc)
+                rc = rc.value
+            else:
+                reason = disconnect_reasons.get(rc, f"Unknown reason code: {rc}")
             logger.warning(f"⚠️  Unexpected disconnect from MQTT broker. Return code: {rc} ({reason})")
             
-            if rc == 7:
-                logger.info("Attempting to reconnect...")
-                self._reconnect()
+            # paho's network loop reconnects on its own (see reconnect_delay_set)
+            logger.info("Reconnecting in the background...")
     
     def _on_publish(self, client, userdata, mid):
         """Callback when message is published"""
@@ -87,30 +152,44 @@ class MQTTClient:
     
     def _on_message(self, client, userdata, msg):
         """Callback when message is received (for debugging subscriptions)"""
-        logger.debug(f"Message received on topic {msg.topic}: {msg.payload.decode()}")
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+        try:
+            message = MQTT_MESSAGE_ADAPTER.validate_json(msg.payload)
+            logger.debug(f"Message received on topic {msg.topic}: {message.action} "
+                         f"for {message.operator_id} on {message.machine_no}")
+        except ValidationError:
+            logger.debug(f"Message received on topic {msg.topic}: {msg.payload!r}")
     
-    def _reconnect(self):
-        """Attempt to reconnect to MQTT broker"""
-        while self.connection_attempts < self.max_reconnect_attempts and not self.connected:
-            self.connection_attempts += 1
-            logger.info(f"Reconnection attempt {self.connection_attempts}/{self.max_reconnect_attempts}...")
-            
-            try:
-                self.client.reconnect()
-                time.sleep(1)  # Give it a moment to connect
-                
-                if self.connected:
-                    logger.info("✅ Reconnection successful!")
-                    return True
-            except Exception as e:
-                logger.error(f"Reconnection failed: {e}")
-            
-            time.sleep(self.reconnect_delay)
-        
-        if not self.connected:
-            logger.error(f"❌ Failed to reconnect after {self.max_reconnect_attempts} attempts")
-        
-        return self.connected
+    def _queue_message(self, topic: str, payload: bytes):
+        """Hold a message until the broker connection is back"""
+        if len(self._pending) == self._pending.maxlen:
+            logger.warning("⚠️  Pending message queue full, dropping oldest message")
+        self._pending.append((topic, payload, time.monotonic()))
+        logger.info(f"Message queued for delivery on reconnect ({len(self._pending)} pending)")
+    
+    def _queue_if_disconnected(self, topic: str, payload: bytes) -> bool:
+        """Queue the message and return True if not connected; atomic with the reconnect flush"""
+        with self._pending_lock:
+            if self.connected:
+                return False
+            self._queue_message(topic, payload)
+            return True
+    
+    def _flush_pending(self):
+        """Replay messages queued while disconnected (call with _pending_lock held)"""
+        if self._pending:
+            logger.info(f"Replaying {len(self._pending)} queued message(s)...")
+        while self._pending:
+            topic, payload, queued_at = self._pending.popleft()
+            # Never replay a signal that has outlived its expiry interval
+            if time.monotonic() - queued_at > settings.mqtt_message_expiry:
+                logger.warning(f"⚠️  Dropping expired queued message for {topic}")
+                continue
+            self.client.publish(
+                topic, payload, qos=1, retain=False,
+                properties=self._publish_properties
+            )
     
     def connect(self):
         """Connect to MQTT broker"""
@@ -121,47 +200,23 @@ class MQTTClient:
             logger.debug(f"Username: {settings.mqtt_username}")
             logger.debug(f"TLS: {settings.mqtt_use_tls}")
             
-            # Create client
-            self.client = mqtt.Client(
-                client_id=f"FastAPI_Backend_{int(time.time())}",
-                clean_session=True
-            )
-            
-            # Set callbacks
-            self.client.on_connect = self._on_connect
-            self.client.on_disconnect = self._on_disconnect
-            self.client.on_publish = self._on_publish
-            self.client.on_message = self._on_message
-            
-            # Set username and password if provided
-            if settings.mqtt_username and settings.mqtt_password:
-                logger.debug("Setting MQTT credentials...")
-                self.client.username_pw_set(
-                    settings.mqtt_username,
-                    settings.mqtt_password
-                )
-            
-            # Configure TLS/SSL if needed
-            if settings.mqtt_use_tls:
-                logger.debug("Configuring TLS/SSL...")
-                self.client.tls_set()
-                self.client.tls_insecure_set(True)  # For testing; use proper certs in production
-            
-            # Connect to broker
-            self.client.connect(
+            # Connect to broker (the network loop retries until it succeeds)
+            self._connected_event.clear()
+            self.client.connect_async(
                 settings.mqtt_broker,
                 settings.mqtt_port,
-                keepalive=60
+                keepalive=60,
+                clean_start=True
             )
             
             # Start network loop in background
             self.client.loop_start()
             
-            # Wait a bit for connection
-            time.sleep(2)
+            # Wait for CONNACK (returns as soon as it arrives)
+            self._connected_event.wait(timeout=2.0)
             
             if not self.connected:
-                logger.warning("⚠️  Connection may not be established yet. Messages might fail.")
+                logger.warning("⚠️  Connection not established yet. Messages will be queued until it is.")
             
         except Exception as e:
             logger.error(f"❌ Error connecting to MQTT broker: {e}")
@@ -188,12 +243,6 @@ class MQTTClient:
         Returns:
             True if published successfully, False otherwise
         """
-        if not self.connected:
-            logger.error("❌ Cannot publish: MQTT client not connected")
-            logger.info("Attempting to reconnect...")
-            if not self._reconnect():
-                return False
-        
         try:
             # Construct topic
             topic = f"{settings.mqtt_topic_prefix}/{machine_no}/unlock"
@@ -203,19 +252,26 @@ class MQTTClient:
                 "action": "unlock",
                 "operator_id": operator_id,
                 "machine_no": machine_no,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": _timestamp()
             }
             
+            # Fail fast while disconnected; the message is replayed on reconnect
+            if self._queue_if_disconnected(topic, orjson.dumps(message)):
+                logger.error("❌ Cannot publish: MQTT client not connected")
+                return False
+            
             # Publish message
             logger.info(f"📤 Publishing unlock signal...")
             logger.info(f"   Topic: {topic}")
-            logger.info(f"   Payload: {json.dumps(message, indent=2)}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("   Payload: %s", orjson.dumps(message, option=orjson.OPT_INDENT_2).decode())
             
             result = self.client.publish(
                 topic,
-                json.dumps(message),
+                orjson.dumps(message),  # bytes, sent as-is
                 qos=1,  # At least once delivery
-                retain=False
+                retain=False,
+                properties=self._publish_properties
             )
             
             # Check if publish was successful
@@ -242,12 +298,6 @@ class MQTTClient:
         Returns:
             True if published successfully, False otherwise
         """
-        if not self.connected:
-            logger.error("❌ Cannot publish: MQTT client not connected")
-            # Try to reconnect, but don't block too long for logout
-            if not self._reconnect():
-                return False
-        
         try:
             # Construct topic (same topic as unlock, different action)
             topic = f"{settings.mqtt_topic_prefix}/{machine_no}/unlock"
@@ -257,19 +307,26 @@ class MQTTClient:
                 "action": "lock",
                 "operator_id": operator_id,
                 "machine_no": machine_no,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": _timestamp()
             }
             
+            # Fail fast while disconnected; the message is replayed on reconnect
+            if self._queue_if_disconnected(topic, orjson.dumps(message)):
+                logger.error("❌ Cannot publish: MQTT client not connected")
+                return False
+            
             # Publish message
             logger.info(f"🔒 Publishing lock signal...")
             logger.info(f"   Topic: {topic}")
-            logger.info(f"   Payload: {json.dumps(message, indent=2)}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("   Payload: %s", orjson.dumps(message, option=orjson.OPT_INDENT_2).decode())
             
             result = self.client.publish(
                 topic,
-                json.dumps(message),
+                orjson.dumps(message),  # bytes, sent as-is
                 qos=1,
-                retain=False
+                retain=False,
+                properties=self._publish_properties
             )
             
             if result.rc == mqtt.MQTT_ERR_SUCCESS:
@@ -1,15 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from database import get_db
 from models import Admin
 from schemas import AdminCreate, AdminLogin, Token, AdminResponse
-from auth import verify_password, get_password_hash, create_access_token, get_current_admin
+from auth import verify_password, get_password_hash, get_login_token, get_current_admin, DUMMY_HASH
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
+# Handlers that hash or verify passwords are plain `def` on purpose: FastAPI
+# runs them in its threadpool, so the CPU-bound KDF never blocks the event loop.
+
 
 @router.post("/create", response_model=AdminResponse, status_code=status.HTTP_201_CREATED)
-async def create_admin(admin_data: AdminCreate, db: Session = Depends(get_db)):
+def create_admin(admin_data: AdminCreate, db: Session = Depends(get_db)):
     """
     Create a new admin account
     This is a helper endpoint for initial setup
@@ -37,24 +41,29 @@ async def create_admin(admin_data: AdminCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/login", response_model=Token)
-async def login(credentials: AdminLogin, db: Session = Depends(get_db)):
+def login(credentials: AdminLogin, db: Session = Depends(get_db)):
     """
     Admin login endpoint
     Returns JWT access token on successful authentication
     """
-    # Find admin by username
-    admin = db.query(Admin).filter(Admin.username == credentials.username).first()
+    # Only the hash is needed, so select that one column
+    hashed_password = db.execute(
+        select(Admin.hashed_password).where(Admin.username == credentials.username)
+    ).scalar()
     
-    # Verify credentials
-    if not admin or not verify_password(credentials.password, admin.hashed_password):
+    # Verify credentials; unknown users are checked against a dummy hash so
+    # both paths pay the same KDF cost and timing doesn't reveal valid usernames
+    password_ok = verify_password(credentials.password, hashed_password or DUMMY_HASH)
+    if hashed_password is None or not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Create access token
-    access_token = create_access_token(data={"sub": admin.username})
+    # Access token for the username that matched exactly; repeated logins
+    # within a few seconds get the same token back
+    access_token = get_login_token(credentials.username)
     
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -69,7 +78,7 @@ async def get_current_admin_info(current_admin: Admin = Depends(get_current_admi
 
 
 @router.post("/reset-database", status_code=status.HTTP_200_OK)
-async def reset_database(
+def reset_database(
     db: Session = Depends(get_db),
     current_admin: Admin = Depends(get_current_admin)
 ):
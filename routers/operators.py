@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response, status, UploadFile, File, Form
 from sqlalchemy.orm import Session
+from sqlalchemy import func, select
 from typing import List, Optional
 from datetime import datetime
 import os
 import shutil
 from database import get_db
 from models import Operator, LoginLog
-from schemas import OperatorCreate, OperatorUpdate, OperatorResponse, LoginLogCreate, LogoutUpdate, LoginLogResponse
+from schemas import OperatorCreate, OperatorUpdate, OperatorResponse, LoginLogCreate, LogoutUpdate, LoginLogResponse, OPERATOR_LIST_ADAPTER, Shift
 from auth import get_current_admin
 from mqtt_client import mqtt_client
 from config import settings
@@ -14,16 +15,22 @@ from config import settings
 router = APIRouter(prefix="/api/operators", tags=["operators"])
 
 
+def _publish_signal(publish, warning: str, **kwargs):
+    """Publish an MQTT signal after the response has been sent"""
+    if not publish(**kwargs):
+        print(warning)
+
+
 # Ensure upload directory exists
 os.makedirs(settings.upload_dir, exist_ok=True)
 
 
 @router.post("", response_model=OperatorResponse, status_code=status.HTTP_201_CREATED)
-async def create_operator(
+def create_operator(
     name: str = Form(...),
     operator_id: str = Form(...),
     machine_no: str = Form(...),
-    shift: Optional[str] = Form(None),
+    shift: Optional[Shift] = Form(None),
     face_image: Optional[UploadFile] = File(None),
     db: Session = Depends(get_db),
     current_admin = Depends(get_current_admin)
@@ -49,9 +56,9 @@ async def create_operator(
         filename = f"{operator_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{file_extension}"
         file_path = os.path.join(settings.upload_dir, filename)
         
-        # Save file
+        # Save file (64 KiB chunks instead of the 16 KiB default)
         with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(face_image.file, buffer)
+            shutil.copyfileobj(face_image.file, buffer, length=64 * 1024)
         
         face_image_path = file_path
     
@@ -73,7 +80,7 @@ async def create_operator(
 
 
 @router.get("", response_model=List[OperatorResponse])
-async def get_all_operators(
+def get_all_operators(
     db: Session = Depends(get_db),
     current_admin = Depends(get_current_admin)
 ):
@@ -81,12 +88,23 @@ async def get_all_operators(
     Get list of all operators
     Requires admin authentication
     """
-    operators = db.query(Operator).filter(Operator.deleted == False).all()
-    return operators
+    # Plain column rows instead of ORM instances: no identity map and no
+    # instrumented attribute access per field
+    rows = db.execute(
+        select(
+            Operator.id, Operator.name, Operator.operator_id, Operator.machine_no,
+            Operator.shift, Operator.status, Operator.face_image_path, Operator.created_at
+        ).where(Operator.deleted == False)
+    ).mappings()
+    
+    # Validate and serialize the whole list in pydantic-core, skipping
+    # FastAPI's response_model pass (kept on the route for the OpenAPI schema)
+    operators = OPERATOR_LIST_ADAPTER.validate_python(rows.all())
+    return Response(content=OPERATOR_LIST_ADAPTER.dump_json(operators), media_type="application/json")
 
 
 @router.get("/{operator_id}", response_model=OperatorResponse)
-async def get_operator(
+def get_operator(
     operator_id: str,
     db: Session = Depends(get_db),
     current_admin = Depends(get_current_admin)
@@ -108,7 +126,7 @@ async def get_operator(
 
 
 @router.put("/{operator_id}", response_model=OperatorResponse)
-async def update_operator(
+def update_operator(
     operator_id: str,
     operator_data: OperatorUpdate,
     db: Session = Depends(get_db),
@@ -140,7 +158,7 @@ async def update_operator(
 
 
 @router.delete("/{operator_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_operator(
+def delete_operator(
     operator_id: str,
     db: Session = Depends(get_db),
     current_admin = Depends(get_current_admin)
@@ -163,12 +181,16 @@ async def delete_operator(
     operator.cloud_updated_at = datetime.now()  # Critical for sync to detect deletion
     operator.synced_to_cloud = False  # Mark for sync
     
-    # Soft delete associated login logs
-    db.query(LoginLog).filter(LoginLog.operator_id == operator_id).update({
+    # Soft delete associated login logs that aren't deleted yet (single UPDATE,
+    # server-side timestamp, no identity-map sync needed before commit)
+    db.query(LoginLog).filter(
+        LoginLog.operator_id == operator_id,
+        LoginLog.deleted == False
+    ).update({
         "deleted": True,
-        "deleted_at": datetime.now(),
+        "deleted_at": func.now(),
         "synced_to_cloud": False
-    })
+    }, synchronize_session=False)
     
     db.commit()
     
@@ -176,8 +198,9 @@ async def delete_operator(
 
 
 @router.post("/login", response_model=LoginLogResponse)
-async def operator_login(
+def operator_login(
     login_data: LoginLogCreate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
@@ -201,29 +224,29 @@ async def operator_login(
         operator_id=login_data.operator_id,
         login_time=datetime.now(),
         shift=login_data.shift,
-        date=login_data.date
+        date=login_data.date.isoformat()
     )
     
     db.add(login_log)
     db.commit()
     db.refresh(login_log)
     
-    # Publish MQTT unlock signal
-    timestamp = datetime.now().isoformat()
-    mqtt_success = mqtt_client.publish_unlock_signal(
+    # Publish MQTT unlock signal once the response is out (broker RTT off the request path)
+    background_tasks.add_task(
+        _publish_signal,
+        mqtt_client.publish_unlock_signal,
+        "Warning: Failed to publish MQTT signal",
         operator_id=login_data.operator_id,
         machine_no=operator.machine_no
     )
     
-    if not mqtt_success:
-        print("Warning: Failed to publish MQTT signal")
-    
     return login_log
 
 
 @router.post("/logout", status_code=status.HTTP_200_OK)
-async def operator_logout(
+def operator_logout(
     logout_data: LogoutUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
@@ -252,13 +275,13 @@ async def operator_logout(
         login_log.logout_time = datetime.now()
         db.commit()
         
-    # Publish MQTT lock signal
-    mqtt_success = mqtt_client.publish_lock_signal(
+    # Publish MQTT lock signal once the response is out
+    background_tasks.add_task(
+        _publish_signal,
+        mqtt_client.publish_lock_signal,
+        "Warning: Failed to publish MQTT lock signal",
         machine_no=operator.machine_no,
         operator_id=operator.operator_id
     )
     
-    if not mqtt_success:
-        print("Warning: Failed to publish MQTT lock signal")
-    
     return {"message": "Logout successful"}
\ No newline at end of file
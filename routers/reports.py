@@ -1,93 +1,182 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
+from contextlib import ExitStack, contextmanager
 from datetime import datetime, timedelta
-from typing import List
+from itertools import chain
+from typing import List, Optional
 import io
+import orjson
+import traceback
+from urllib.parse import quote
 from reportlab.lib.pagesizes import letter
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from database import get_db
 from models import Operator, LoginLog
-from schemas import OperatorReport, ReportEntry
+from schemas import OperatorReport
 from auth import get_current_admin
 
 router = APIRouter(prefix="/api/reports", tags=["reports"])
 
+# Report entries fetched from the database and flushed to the client per chunk
+REPORT_STREAM_BATCH = 500
+
+
+def _duration_seconds(dialect_name: str):
+    """SQL expression for a log's duration in seconds (NULL while still logged in)"""
+    if dialect_name == "sqlite":
+        return (func.julianday(LoginLog.logout_time) - func.julianday(LoginLog.login_time)) * 86400.0
+    return func.extract("epoch", LoginLog.logout_time - LoginLog.login_time)
+
+
+def _report_totals(db: Session, operator_id: str) -> tuple:
+    """(total_logins, total_hours) for an operator, aggregated in the database"""
+    # Open sessions count as logins but add no hours (their duration is NULL)
+    total_logins, total_seconds = db.execute(
+        select(
+            func.count(LoginLog.id),
+            func.coalesce(func.sum(_duration_seconds(db.bind.dialect.name)), 0)
+        ).where(LoginLog.operator_id == operator_id)
+    ).one()
+    return total_logins, float(total_seconds) / 3600
+
+
+def _report_entry(log_date: str, shift: str, login_time: datetime, logout_time: Optional[datetime]) -> dict:
+    """One report entry in the ReportEntry shape (times as whole seconds, HH:MM:SS)"""
+    duration_hours = None
+    if logout_time:
+        duration_hours = (logout_time - login_time).total_seconds() / 3600
+        logout_time = logout_time.time().replace(microsecond=0)
+    
+    return {
+        "date": log_date,
+        "shift": shift,
+        "login_time": login_time.time().replace(microsecond=0),
+        "logout_time": logout_time,
+        "duration_hours": round(duration_hours, 2) if duration_hours else None
+    }
+
+
+def _attachment_disposition(filename: str) -> str:
+    """Content-Disposition for a download, quoted the way Starlette's FileResponse does"""
+    quoted = quote(filename)
+    if quoted != filename:
+        # Non-ASCII or special characters: RFC 5987 form keeps the header latin-1 safe
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def _open_db(request: Request):
+    """Session from get_db (or its override), for use outside the dependency scope"""
+    provider = request.app.dependency_overrides.get(get_db, get_db)
+    return contextmanager(provider)()
+
+
+def _stream_report(resources: ExitStack, header: dict, batches):
+    """Yield the report JSON with entries written out in batches, never all held at once"""
+    try:
+        # Header fields first, then open the entries array
+        yield orjson.dumps(header)[:-1] + b',"entries":['
+        
+        separator = b""
+        for batch in batches:
+            if batch:
+                yield separator + b",".join(orjson.dumps(_report_entry(*row[:4])) for row in batch)
+                separator = b","
+        
+        yield b"]}"
+    except Exception as e:
+        # The 200 is already on the wire: log, then re-raise so the body is cut
+        # off (client sees incomplete JSON) rather than closed as if complete
+        print(f"🔥 Report stream for {header['operator_id']} failed: {e}")
+        traceback.print_exc()
+        raise
+    finally:
+        resources.close()
+
 
 @router.get("/{operator_id}", response_model=OperatorReport)
-async def get_operator_report(
+def get_operator_report(
     operator_id: str,
-    db: Session = Depends(get_db),
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
     current_admin = Depends(get_current_admin)
 ):
     """
     Get performance report for an operator
+    Totals cover every log; limit/offset page the entries
     Requires admin authentication
     """
-    # Get operator details
-    operator = db.query(Operator).filter(Operator.operator_id == operator_id).first()
-    if not operator:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Operator with ID {operator_id} not found"
-        )
-    
-    # Get all login logs for this operator
-    login_logs = db.query(LoginLog).filter(
-        LoginLog.operator_id == operator_id
-    ).order_by(LoginLog.login_time.desc()).all()
-    
-    # Calculate statistics
-    total_logins = len(login_logs)
-    total_hours = 0.0
-    entries = []
-    
-    for log in login_logs:
-        # Calculate duration
-        duration_hours = None
-        logout_time_str = None
+    # The session outlives this handler (entries stream afterwards), so it is
+    # opened from get_db by hand and closed by the stream
+    resources = ExitStack()
+    try:
+        db = resources.enter_context(_open_db(request))
         
-        if log.logout_time:
-            duration = log.logout_time - log.login_time
-            duration_hours = duration.total_seconds() / 3600
-            total_hours += duration_hours
-            logout_time_str = log.logout_time.strftime("%H:%M:%S")
+        # Get operator details
+        operator = db.query(Operator).filter(Operator.operator_id == operator_id).first()
+        if not operator:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Operator with ID {operator_id} not found"
+            )
         
-        # Create report entry
-        entry = ReportEntry(
-            date=log.date,
-            shift=log.shift,
-            login_time=log.login_time.strftime("%H:%M:%S"),
-            logout_time=logout_time_str,
-            duration_hours=round(duration_hours, 2) if duration_hours else None
-        )
-        entries.append(entry)
+        # One statement for the page of entries and the totals over all logs
+        # (window aggregates run before LIMIT/OFFSET), so both share a snapshot
+        logs_query = select(
+            LoginLog.date, LoginLog.shift, LoginLog.login_time, LoginLog.logout_time,
+            func.count().over(),
+            func.coalesce(func.sum(_duration_seconds(db.bind.dialect.name)).over(), 0)
+        ).where(
+            LoginLog.operator_id == operator_id
+        ).order_by(LoginLog.login_time.desc()).offset(offset)
+        if limit is not None:
+            logs_query = logs_query.limit(limit)
+        
+        # The first batch is read here so query errors still become a normal 500
+        batches = db.execute(logs_query.execution_options(yield_per=REPORT_STREAM_BATCH)).partitions()
+        first_batch = next(batches, [])
+        if first_batch:
+            total_logins, total_seconds = first_batch[0][4], first_batch[0][5]
+            total_hours = float(total_seconds) / 3600
+        else:
+            # Empty page (or no logs): no entries to disagree with
+            total_logins, total_hours = _report_totals(db, operator_id)
+    except BaseException:
+        resources.close()
+        raise
     
     # Calculate average duration
     average_duration = 0.0
     if total_logins > 0:
         average_duration = total_hours / total_logins
     
-    # Create report
-    report = OperatorReport(
-        operator_id=operator.operator_id,
-        operator_name=operator.name,
-        machine_no=operator.machine_no,
-        shift=operator.shift,
-        total_logins=total_logins,
-        total_hours=round(total_hours, 2),
-        average_duration=round(average_duration, 2),
-        entries=entries
-    )
+    # Report header, sent ahead of the entries
+    header = {
+        "operator_id": operator.operator_id,
+        "operator_name": operator.name,
+        "machine_no": operator.machine_no,
+        "shift": operator.shift,
+        "total_logins": total_logins,
+        "total_hours": round(total_hours, 2),
+        "average_duration": round(average_duration, 2)
+    }
     
-    return report
+    # Entries are streamed in OperatorReport shape straight from orjson, so
+    # long histories never sit in memory as one list; the route keeps
+    # response_model=OperatorReport for the OpenAPI schema
+    return StreamingResponse(
+        _stream_report(resources, header, chain([first_batch], batches)),
+        media_type="application/json"
+    )
 
 
-@router.get("/{operator_id}/export", response_class=FileResponse)
-async def export_operator_report(
+@router.get("/{operator_id}/export", response_class=Response)
+def export_operator_report(
     operator_id: str,
     db: Session = Depends(get_db),
     current_admin = Depends(get_current_admin)
@@ -173,17 +262,12 @@ async def export_operator_report(
     
     # Build PDF
     doc.build(elements)
-    buffer.seek(0)
     
-    # Save to file
+    # Send straight from memory; nothing is written to disk
     filename = f"report_{operator_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-    filepath = f"./uploads/{filename}"
-    
-    with open(filepath, "wb") as f:
-        f.write(buffer.getvalue())
     
-    return FileResponse(
-        filepath,
+    return Response(
+        content=buffer.getvalue(),
         media_type='application/pdf',
-        filename=filename
+        headers={"Content-Disposition": _attachment_disposition(filename)}
     )
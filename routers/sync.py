@@ -1,102 +1,219 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse
+from sqlalchemy import insert, select, tuple_
 from sqlalchemy.orm import Session
 from database import get_db
 from models import Operator, LoginLog, Admin
 from typing import List, Dict, Optional
 from datetime import datetime, timezone
+from functools import lru_cache
+from cachetools import LRUCache, cached
 from pydantic import BaseModel
 import os
 import base64
+import hashlib
+import threading
 from config import settings
 
 router = APIRouter(prefix="/api/sync", tags=["sync"])
 
+# Byte budget per worker for cached base64 face images (least recently used evicted first)
+FACE_IMAGE_B64_CACHE_BYTES = 32 * 1024 * 1024
+
+# (operator_id, login_time) pairs per existence query; keeps SQLite under its bind limit
+LOG_KEY_CHUNK = 400
+
+
+@lru_cache(maxsize=256)
+def _face_image_sha256(path: str, mtime: float) -> str:
+    """SHA-256 of an image file; mtime is part of the key so rewrites invalidate it"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@cached(
+    LRUCache(maxsize=FACE_IMAGE_B64_CACHE_BYTES, getsizeof=len),
+    lock=threading.Lock()
+)
+def _face_image_b64(path: str, mtime: float) -> str:
+    """Base64 of an image file, cached per (path, mtime) across sync polls"""
+    with open(path, 'rb') as f:
+        return base64.b64encode(f.read()).decode('utf-8')
+
+
+def _write_file(filepath: str, data: bytes):
+    """Write bytes straight to a file descriptor, bypassing Python's buffered IO"""
+    fd = os.open(filepath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+    finally:
+        os.close(fd)
+
+
+def _insert_batch(db: Session, model, rows: List[Dict]):
+    """Insert a batch of rows with one executemany, commit it and clear the list"""
+    db.flush()
+    db.execute(insert(model), rows)
+    db.commit()
+    rows.clear()
+
+
+def _log_key(operator_id: str, login_time: datetime, dialect_name: str) -> tuple:
+    """Dedup key for an incoming log, comparable with the keys from _existing_log_keys"""
+    if dialect_name == "sqlite":
+        # SQLite stores and compares the wall-clock time only
+        return operator_id, login_time.replace(tzinfo=None)
+    # Naive values match the wall-clock key, aware ones the instant
+    return operator_id, login_time
+
+
+def _existing_log_keys(db: Session, keys: List[tuple]) -> set:
+    """Keys of logs already stored, matched by the database itself"""
+    existing = set()
+    for start in range(0, len(keys), LOG_KEY_CHUNK):
+        chunk = keys[start:start + LOG_KEY_CHUNK]
+        # The IN comparison runs in SQL, so naive incoming times are read in
+        # the session TimeZone exactly as they are when inserted
+        for operator_id, login_time in db.query(LoginLog.operator_id, LoginLog.login_time).filter(
+            tuple_(LoginLog.operator_id, LoginLog.login_time).in_(chunk)
+        ):
+            # Aware values come back in the session TimeZone: the naive form
+            # is the wall-clock a naive incoming time was stored from
+            existing.add((operator_id, login_time.replace(tzinfo=None)))
+            if login_time.tzinfo is not None:
+                existing.add((operator_id, login_time))
+    return existing
+
 
 # ============= SYNC ALL DATA =============
 
-@router.get("/all")
-async def get_all_data_since(since: str = "2000-01-01T00:00:00", db: Session = Depends(get_db)):
+@router.get("/all", response_class=ORJSONResponse)
+def get_all_data_since(
+    since: str = "2000-01-01T00:00:00",
+    include_images: bool = True,
+    db: Session = Depends(get_db)
+):
     """
     Get ALL data (operators, logs, admins) updated since timestamp
     Used by Pi to pull complete state from cloud
+    
+    Each operator carries face_image_url + face_image_sha256; clients that
+    compare the hash and fetch changed images from /uploads (with ETag
+    caching) should pass include_images=false to skip the base64 copies.
     """
     try:
         since_dt = datetime.fromisoformat(since.replace('Z', '+00:00'))
     except ValueError:
         since_dt = datetime(2000, 1, 1)
     
+    # Select plain columns rather than ORM instances: rows are tuples,
+    # so there is no identity-map bookkeeping or per-attribute descriptor access
+    
     # Get operators (created OR updated OR deleted since timestamp)
-    operators = db.query(Operator).filter(
-        (Operator.cloud_updated_at > since_dt) | (Operator.created_at > since_dt)
+    operators = db.execute(
+        select(
+            Operator.operator_id, Operator.name, Operator.machine_no, Operator.shift,
+            Operator.status, Operator.face_image_path, Operator.created_at,
+            Operator.cloud_updated_at, Operator.deleted, Operator.deleted_at
+        ).where(
+            (Operator.cloud_updated_at > since_dt) | (Operator.created_at > since_dt)
+        )
     ).all()
     
     operators_data = []
-    for op in operators:
-        # Encode face image to base64 if exists
+    for (operator_id, name, machine_no, shift, status, face_image_path,
+         created_at, cloud_updated_at, deleted, deleted_at) in operators:
         face_image_b64 = None
-        if op.face_image_path and os.path.exists(op.face_image_path):
+        face_image_url = None
+        face_image_sha256 = None
+        if face_image_path:
             try:
-                with open(op.face_image_path, 'rb') as f:
-                    face_image_b64 = base64.b64encode(f.read()).decode('utf-8')
+                mtime = os.stat(face_image_path).st_mtime
+                face_image_url = f"/uploads/{os.path.basename(face_image_path)}"
+                face_image_sha256 = _face_image_sha256(face_image_path, mtime)
+                
+                # Encode face image to base64 (legacy clients)
+                if include_images:
+                    face_image_b64 = _face_image_b64(face_image_path, mtime)
+            except FileNotFoundError:
+                pass
             except Exception as e:
                 print(f"Error encoding image: {e}")
         
         operators_data.append({
-            "operator_id": op.operator_id,
-            "name": op.name,
-            "machine_no": op.machine_no,
-            "shift": op.shift,
-            "status": op.status,
+            "operator_id": operator_id,
+            "name": name,
+            "machine_no": machine_no,
+            "shift": shift,
+            "status": status,
             "face_image_b64": face_image_b64,
-            "created_at": op.created_at.isoformat(),
-            "cloud_updated_at": op.cloud_updated_at.isoformat() if op.cloud_updated_at else None,
-            "deleted": op.deleted,
-            "deleted_at": op.deleted_at.isoformat() if op.deleted_at else None
+            "face_image_url": face_image_url,
+            "face_image_sha256": face_image_sha256,
+            "created_at": created_at,
+            "cloud_updated_at": cloud_updated_at,
+            "deleted": deleted,
+            "deleted_at": deleted_at
         })
     
     # Get login logs (created OR deleted since timestamp)
-    logs = db.query(LoginLog).filter(
-        (LoginLog.created_at > since_dt) | (LoginLog.deleted_at > since_dt)
-    ).all()
+    logs = db.execute(
+        select(
+            LoginLog.operator_id, LoginLog.login_time, LoginLog.logout_time, LoginLog.shift,
+            LoginLog.date, LoginLog.created_at, LoginLog.deleted, LoginLog.deleted_at
+        ).where(
+            (LoginLog.created_at > since_dt) | (LoginLog.deleted_at > since_dt)
+        )
+    )
     
-    logs_data = []
-    for log in logs:
-        logs_data.append({
-            "operator_id": log.operator_id,
-            "login_time": log.login_time.isoformat(),
-            "logout_time": log.logout_time.isoformat() if log.logout_time else None,
-            "shift": log.shift,
-            "date": log.date,
-            "created_at": log.created_at.isoformat(),
-            "deleted": log.deleted,
-            "deleted_at": log.deleted_at.isoformat() if log.deleted_at else None
-        })
+    logs_data = [
+        {
+            "operator_id": operator_id,
+            "login_time": login_time,
+            "logout_time": logout_time,
+            "shift": shift,
+            "date": date,
+            "created_at": created_at,
+            "deleted": deleted,
+            "deleted_at": deleted_at
+        }
+        for operator_id, login_time, logout_time, shift, date, created_at, deleted, deleted_at in logs
+    ]
     
     # Get admins
-    admins = db.query(Admin).filter(
-        Admin.created_at > since_dt
-    ).all()
+    admins = db.execute(
+        select(Admin.id, Admin.username, Admin.hashed_password, Admin.created_at).where(
+            Admin.created_at > since_dt
+        )
+    )
     
-    admins_data = []
-    for admin in admins:
-        admins_data.append({
-            "id": admin.id,
-            "username": admin.username,
-            "hashed_password": admin.hashed_password,
-            "created_at": admin.created_at.isoformat()
-        })
+    admins_data = [
+        {
+            "id": admin_id,
+            "username": username,
+            "hashed_password": hashed_password,
+            "created_at": created_at
+        }
+        for admin_id, username, hashed_password, created_at in admins
+    ]
     
-    return {
+    # Plain dicts go straight to orjson, which writes datetimes as ISO 8601
+    # itself; no jsonable_encoder pass over the whole payload
+    return ORJSONResponse(content={
         "operators": operators_data,
         "logs": logs_data,
         "admins": admins_data,
-        "sync_timestamp": datetime.now(timezone.utc).isoformat()
-    }
+        "sync_timestamp": datetime.now(timezone.utc)
+    })
 
 
 @router.post("/all")
-async def receive_all_data(data: Dict, db: Session = Depends(get_db)):
+def receive_all_data(data: Dict, db: Session = Depends(get_db)):
     """
     Receive ALL data from Raspberry Pi
     Handles operators, logs, admins with timestamp-based conflict resolution
@@ -104,13 +221,24 @@ async def receive_all_data(data: Dict, db: Session = Depends(get_db)):
     operators_count = 0
     logs_count = 0
     admins_count = 0
+    dialect_name = db.get_bind().dialect.name
+    
+    # One clock read per sync; every row gets the same sync timestamp
+    sync_now = datetime.now()
+    image_stamp = sync_now.strftime('%Y%m%d_%H%M%S')
+    
+    # Prefetch existing operators in one query instead of one SELECT per row
+    incoming_operators = data.get('operators', [])
+    operator_ids = [op_data['operator_id'] for op_data in incoming_operators if 'operator_id' in op_data]
+    existing_operators = {
+        op.operator_id: op
+        for op in db.query(Operator).filter(Operator.operator_id.in_(operator_ids)).all()
+    }
     
     # Sync Operators
-    for op_data in data.get('operators', []):
+    for op_data in incoming_operators:
         try:
-            existing = db.query(Operator).filter(
-                Operator.operator_id == op_data['operator_id']
-            ).first()
+            existing = existing_operators.get(op_data['operator_id'])
             
             incoming_timestamp = datetime.fromisoformat(op_data.get('created_at', '2000-01-01T00:00:00'))
             
@@ -124,16 +252,15 @@ async def receive_all_data(data: Dict, db: Session = Depends(get_db)):
                     existing.status = op_data.get('status', 'Offline')
                     existing.deleted = op_data.get('deleted', False)
                     existing.deleted_at = datetime.fromisoformat(op_data['deleted_at']) if op_data.get('deleted_at') else None
-                    existing.cloud_updated_at = datetime.now()
+                    existing.cloud_updated_at = sync_now
                     
                     # Handle face image
                     if op_data.get('face_image_b64'):
                         try:
                             image_data = base64.b64decode(op_data['face_image_b64'])
-                            filename = f"{op_data['operator_id']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
+                            filename = f"{op_data['operator_id']}_{image_stamp}.jpg"
                             filepath = os.path.join(settings.upload_dir, filename)
-                            with open(filepath, 'wb') as f:
-                                f.write(image_data)
+                            _write_file(filepath, image_data)
                             existing.face_image_path = filepath
                         except Exception as e:
                             print(f"Error saving image: {e}")
@@ -143,11 +270,10 @@ async def receive_all_data(data: Dict, db: Session = Depends(get_db)):
                 if op_data.get('face_image_b64'):
                     try:
                         image_data = base64.b64decode(op_data['face_image_b64'])
-                        filename = f"{op_data['operator_id']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
+                        filename = f"{op_data['operator_id']}_{image_stamp}.jpg"
                         filepath = os.path.join(settings.upload_dir, filename)
                         os.makedirs(settings.upload_dir, exist_ok=True)
-                        with open(filepath, 'wb') as f:
-                            f.write(image_data)
+                        _write_file(filepath, image_data)
                         face_image_path = filepath
                     except Exception as e:
                         print(f"Error saving image: {e}")
@@ -162,55 +288,83 @@ async def receive_all_data(data: Dict, db: Session = Depends(get_db)):
                     deleted=op_data.get('deleted', False),
                     deleted_at=datetime.fromisoformat(op_data['deleted_at']) if op_data.get('deleted_at') else None,
                     synced_to_cloud=True,
-                    cloud_updated_at=datetime.now()
+                    cloud_updated_at=sync_now
                 )
                 db.add(operator)
+                existing_operators[operator.operator_id] = operator
             operators_count += 1
         except Exception as e:
             print(f"Error syncing operator: {e}")
     
-    # Sync Login Logs
-    for log_data in data.get('logs', []):
+    # Prefetch the (operator_id, login_time) keys we already have
+    incoming_logs = data.get('logs', [])
+    incoming_keys = []
+    for log_data in incoming_logs:
+        try:
+            incoming_keys.append((log_data['operator_id'], datetime.fromisoformat(log_data['login_time'])))
+        except (KeyError, TypeError, ValueError):
+            pass  # Reported by the per-row loop below
+    
+    existing_log_keys = _existing_log_keys(db, incoming_keys)
+    
+    # Sync Login Logs, inserted and committed in batches so a large offline
+    # backlog never holds more than sync_batch_size pending rows
+    new_logs = []
+    for log_data in incoming_logs:
         try:
-            existing = db.query(LoginLog).filter(
-                LoginLog.operator_id == log_data['operator_id'],
-                LoginLog.login_time == datetime.fromisoformat(log_data['login_time'])
-            ).first()
+            login_time = datetime.fromisoformat(log_data['login_time'])
+            log_key = _log_key(log_data['operator_id'], login_time, dialect_name)
             
-            if not existing:
-                log = LoginLog(
-                    operator_id=log_data['operator_id'],
-                    login_time=datetime.fromisoformat(log_data['login_time']),
-                    logout_time=datetime.fromisoformat(log_data['logout_time']) if log_data.get('logout_time') else None,
-                    shift=log_data['shift'],
-                    date=log_data['date'],
-                    deleted=log_data.get('deleted', False),
-                    deleted_at=datetime.fromisoformat(log_data['deleted_at']) if log_data.get('deleted_at') else None,
-                    synced_to_cloud=True,
-                    synced_at=datetime.now()
-                )
-                db.add(log)
+            if log_key not in existing_log_keys:
+                new_logs.append({
+                    "operator_id": log_data['operator_id'],
+                    "login_time": login_time,
+                    "logout_time": datetime.fromisoformat(log_data['logout_time']) if log_data.get('logout_time') else None,
+                    "shift": log_data['shift'],
+                    "date": log_data['date'],
+                    "deleted": log_data.get('deleted', False),
+                    "deleted_at": datetime.fromisoformat(log_data['deleted_at']) if log_data.get('deleted_at') else None,
+                    "synced_to_cloud": True,
+                    "synced_at": sync_now
+                })
+                existing_log_keys.add(log_key)
                 logs_count += 1
         except Exception as e:
             print(f"Error syncing log: {e}")
+        
+        if len(new_logs) >= settings.sync_batch_size:
+            _insert_batch(db, LoginLog, new_logs)
+    
+    if new_logs:
+        # Remainder; _insert_batch flushes new operators first (foreign key)
+        _insert_batch(db, LoginLog, new_logs)
+    
+    # Prefetch existing admin usernames
+    incoming_admins = data.get('admins', [])
+    existing_usernames = {
+        username
+        for (username,) in db.query(Admin.username).filter(
+            Admin.username.in_([a['username'] for a in incoming_admins if 'username' in a])
+        )
+    }
     
     # Sync Admins
-    for admin_data in data.get('admins', []):
+    new_admins = []
+    for admin_data in incoming_admins:
         try:
-            existing = db.query(Admin).filter(
-                Admin.username == admin_data['username']
-            ).first()
-            
-            if not existing:
-                admin = Admin(
-                    username=admin_data['username'],
-                    hashed_password=admin_data['hashed_password']
-                )
-                db.add(admin)
+            if admin_data['username'] not in existing_usernames:
+                new_admins.append({
+                    "username": admin_data['username'],
+                    "hashed_password": admin_data['hashed_password']
+                })
+                existing_usernames.add(admin_data['username'])
                 admins_count += 1
         except Exception as e:
             print(f"Error syncing admin: {e}")
     
+    if new_admins:
+        db.execute(insert(Admin), new_admins)
+    
     db.commit()
     
     return {
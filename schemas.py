@@ -1,6 +1,14 @@
-from pydantic import BaseModel, Field
-from typing import Optional
-from datetime import datetime
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints, TypeAdapter
+from typing import Annotated, Literal, Optional
+from datetime import date, datetime, time
+
+
+# Shared constrained string for IDs/codes; one validator definition reused by every field
+ShortStr50 = Annotated[str, StringConstraints(min_length=1, max_length=50)]
+
+# Fixed value sets accepted on input (responses stay str for legacy/synced rows)
+Shift = Literal["Day", "Night"]
+OperatorStatus = Literal["Active", "Offline"]
 
 
 # ============= Admin Schemas =============
@@ -19,8 +27,7 @@ class AdminResponse(BaseModel):
     username: str
     created_at: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class Token(BaseModel):
@@ -31,16 +38,16 @@ class Token(BaseModel):
 # ============= Operator Schemas =============
 class OperatorCreate(BaseModel):
     name: str = Field(..., min_length=1, max_length=100)
-    operator_id: str = Field(..., min_length=1, max_length=50)
-    machine_no: str = Field(..., min_length=1, max_length=50)
-    shift: Optional[str] = None
+    operator_id: ShortStr50
+    machine_no: ShortStr50
+    shift: Optional[Shift] = None
 
 
 class OperatorUpdate(BaseModel):
     name: Optional[str] = None
     machine_no: Optional[str] = None
-    shift: Optional[str] = None
-    status: Optional[str] = None
+    shift: Optional[Shift] = None
+    status: Optional[OperatorStatus] = None
 
 
 class OperatorResponse(BaseModel):
@@ -53,15 +60,18 @@ class OperatorResponse(BaseModel):
     face_image_path: Optional[str]
     created_at: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+# Validates/serializes whole operator lists in one pydantic-core call
+OPERATOR_LIST_ADAPTER = TypeAdapter(list[OperatorResponse])
 
 
 # ============= Login Log Schemas =============
 class LoginLogCreate(BaseModel):
     operator_id: str
-    shift: str
-    date: str  # YYYY-MM-DD format
+    shift: Shift
+    date: date  # YYYY-MM-DD format
 
 
 class LogoutUpdate(BaseModel):
@@ -74,19 +84,20 @@ class LoginLogResponse(BaseModel):
     login_time: datetime
     logout_time: Optional[datetime]
     shift: str
-    date: str
+    date: date
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # ============= Report Schemas =============
 class ReportEntry(BaseModel):
-    date: str
+    date: date
     shift: str
-    login_time: str
-    logout_time: Optional[str]
+    login_time: time  # HH:MM:SS
+    logout_time: Optional[time]
     duration_hours: Optional[float]
+    
+    model_config = ConfigDict(frozen=True)
 
 
 class OperatorReport(BaseModel):
@@ -106,3 +117,7 @@ class MQTTMessage(BaseModel):
     operator_id: str
     machine_no: str
     timestamp: str
+
+
+# Built once; validate_json parses raw MQTT payload bytes without an intermediate dict
+MQTT_MESSAGE_ADAPTER = TypeAdapter(MQTTMessage)
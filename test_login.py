@@ -1,15 +1,16 @@
-import requests
-import json
+import httpx
+
+# Shared client so repeated calls reuse the same keep-alive connection
+client = httpx.Client(base_url="http://localhost:8000", timeout=10.0)
 
 # Test admin login
-url = "http://localhost:8000/api/admin/login"
 data = {
     "username": "admin",
     "password": "admin123"
 }
 
 try:
-    response = requests.post(url, json=data)
+    response = client.post("/api/admin/login", json=data)
     print(f"Status Code: {response.status_code}")
     print(f"Response: {response.text}")
     if response.status_code == 200: